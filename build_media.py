@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Build streaming renditions for the Elanicia collection videos
+
+For every MP4 in videos/ this script:
+- segments it into adaptive bitrate HLS renditions (videos/hls/<name>-<hash>/)
+- extracts a poster frame (videos/posters/<name>-<hash>.jpg)
+- records both in videos/media_manifest.json, keyed by the original MP4 path
+- rewrites the <video> elements in the *.html pages to reference the poster
+  and the HLS master playlist directly, ahead of the MP4 fallback
+
+Output directories carry a hash of the source file and of every encoding
+setting, so segments never change under the same URL and can be served with
+long-lived caching (see server.py). Videos whose current hash has already
+been built are skipped; --force rebuilds under a new, timestamped version.
+Superseded builds are deleted only after the pages have been rewritten, and
+the previous version is kept for clients holding cached pages.
+
+Requires ffmpeg and ffprobe on PATH.
+
+Usage:
+    python build_media.py            # build new or changed videos
+    python build_media.py --force    # rebuild everything
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+
+VIDEOS_DIR = "videos"
+HLS_DIR = os.path.join(VIDEOS_DIR, "hls")
+POSTERS_DIR = os.path.join(VIDEOS_DIR, "posters")
+MANIFEST_FILE = os.path.join(VIDEOS_DIR, "media_manifest.json")
+
+# Rendition ladder: (height, video bitrate in kbit/s, H.264 level). Renditions
+# taller than the source are skipped; the smallest one is always produced.
+RENDITIONS = [
+    (1080, 5000, "4.0"),
+    (720, 2800, "3.1"),
+    (480, 1400, "3.0"),
+    (360, 800, "3.0"),
+]
+
+SEGMENT_SECONDS = 4
+POSTER_MAX_HEIGHT = 720
+
+# Encoder flags shared by every rendition
+VIDEO_CODEC_ARGS = ["-c:v", "libx264", "-profile:v", "main", "-preset", "veryfast"]
+# Fixed GOP so every segment starts on a keyframe
+GOP_ARGS = ["-g", "48", "-keyint_min", "48", "-sc_threshold", "0"]
+POSTER_ARGS = ["-ss", "0.5", "-frames:v", "1", "-q:v", "3"]
+
+# Anything that changes the output bytes must be listed here: it is hashed
+# into the version, so changing it moves the output to new URLs
+ENCODING_SETTINGS = json.dumps(
+    [RENDITIONS, SEGMENT_SECONDS, POSTER_MAX_HEIGHT, VIDEO_CODEC_ARGS, GOP_ARGS, POSTER_ARGS]
+)
+
+def run(command):
+    """Run an ffmpeg/ffprobe command, raising on failure"""
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{command[0]} failed: {result.stderr.strip()[-500:]}")
+    return result.stdout
+
+def build_hash(path):
+    """Short hash of the source bytes and encoding settings, used to version output URLs"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    digest.update(ENCODING_SETTINGS.encode("utf-8"))
+    return digest.hexdigest()[:10]
+
+def probe_dimensions(path):
+    """Return (width, height) of the first video stream"""
+    output = run([
+        "ffprobe", "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "stream=width,height", "-of", "json", path
+    ])
+    stream = json.loads(output)["streams"][0]
+    return stream["width"], stream["height"]
+
+def even(value):
+    """Round to the nearest even number (required by libx264)"""
+    return int(round(value / 2.0)) * 2
+
+def codecs_string(level):
+    """RFC 6381 CODECS value for H.264 Main profile at the given level"""
+    return f"avc1.4d40{int(round(float(level) * 10)):02x}"
+
+def measure_bandwidth(out_dir):
+    """
+    Measure a built rendition from its media playlist and segment sizes.
+
+    Returns:
+        tuple: (peak, average) bit rate in bit/s; peak is the highest
+        per-segment rate, as HLS requires for BANDWIDTH
+    """
+    peak = 0
+    total_bits = 0
+    total_seconds = 0.0
+    duration = None
+    with open(os.path.join(out_dir, "index.m3u8"), "r") as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("#EXTINF:"):
+                duration = float(line[len("#EXTINF:"):].split(",", 1)[0])
+            elif line and not line.startswith("#") and duration:
+                bits = os.path.getsize(os.path.join(out_dir, line)) * 8
+                peak = max(peak, bits / duration)
+                total_bits += bits
+                total_seconds += duration
+                duration = None
+    average = total_bits / total_seconds if total_seconds else 0
+    return int(math.ceil(peak)), int(math.ceil(average))
+
+def build_rendition(source, out_dir, width, height, kbps, level):
+    """Encode one HLS rendition into out_dir/index.m3u8"""
+    os.makedirs(out_dir, exist_ok=True)
+    run([
+        "ffmpeg", "-y", "-v", "error", "-i", source,
+        "-vf", f"scale={width}:{height}",
+        *VIDEO_CODEC_ARGS, "-level:v", level,
+        "-b:v", f"{kbps}k", "-maxrate", f"{int(kbps * 1.07)}k", "-bufsize", f"{int(kbps * 1.5)}k",
+        *GOP_ARGS,
+        # The collection videos always play muted
+        "-an",
+        "-f", "hls", "-hls_time", str(SEGMENT_SECONDS), "-hls_playlist_type", "vod",
+        "-hls_segment_filename", os.path.join(out_dir, "segment_%03d.ts"),
+        os.path.join(out_dir, "index.m3u8"),
+    ])
+
+def build_poster(source, poster_path, height):
+    """Extract a JPEG poster frame from just after the start of the video"""
+    os.makedirs(os.path.dirname(poster_path), exist_ok=True)
+    run([
+        "ffmpeg", "-y", "-v", "error", "-i", source, *POSTER_ARGS,
+        "-vf", f"scale=-2:{min(height, POSTER_MAX_HEIGHT)}", poster_path,
+    ])
+
+def remove_old_builds(name, keep):
+    """Delete outputs of versions of a video that are not in keep (a set of versions)"""
+    versioned = re.compile(re.escape(name) + r"-[0-9a-f]{10}(-\d+)?$")
+    for directory in (HLS_DIR, POSTERS_DIR):
+        if not os.path.isdir(directory):
+            continue
+        for entry in os.listdir(directory):
+            stem = os.path.splitext(entry)[0]
+            if versioned.match(stem) and stem not in keep:
+                path = os.path.join(directory, entry)
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+
+def existing_version(name, content_hash):
+    """Return the newest complete build of this source and settings, if any"""
+    prefix = f"{name}-{content_hash}"
+    if not os.path.isdir(HLS_DIR):
+        return None
+    for version in sorted(os.listdir(HLS_DIR), reverse=True):
+        if version == prefix or version.startswith(prefix + "-"):
+            if (os.path.exists(os.path.join(HLS_DIR, version, "master.m3u8"))
+                    and os.path.exists(os.path.join(POSTERS_DIR, f"{version}.jpg"))):
+                return version
+    return None
+
+def build_video(filename, force=False):
+    """
+    Build HLS renditions and a poster for one video.
+
+    Returns:
+        dict: Manifest entry for the video
+    """
+    source = os.path.join(VIDEOS_DIR, filename)
+    name = os.path.splitext(filename)[0]
+    content_hash = build_hash(source)
+    version = None if force else existing_version(name, content_hash)
+    up_to_date = version is not None
+    if version is None:
+        # A forced rebuild gets its own URLs so cached segments are never replaced
+        version = f"{name}-{content_hash}-{int(time.time())}" if force else f"{name}-{content_hash}"
+    out_dir = os.path.join(HLS_DIR, version)
+    master_path = os.path.join(out_dir, "master.m3u8")
+    poster_path = os.path.join(POSTERS_DIR, f"{version}.jpg")
+
+    width, height = probe_dimensions(source)
+    ladder = [r for r in RENDITIONS if r[0] <= height] or [RENDITIONS[-1]]
+
+    if not up_to_date:
+        print(f"🎬 Building {filename} ({width}x{height}, {len(ladder)} renditions)...")
+        if os.path.isdir(out_dir):
+            shutil.rmtree(out_dir)
+        for rendition_height, kbps, level in ladder:
+            build_rendition(source, os.path.join(out_dir, f"{rendition_height}p"),
+                            even(width * rendition_height / height), rendition_height, kbps, level)
+    else:
+        print(f"✅ {filename} is up to date")
+
+    renditions = []
+    for rendition_height, kbps, level in ladder:
+        rendition_dir = os.path.join(out_dir, f"{rendition_height}p")
+        peak, average = measure_bandwidth(rendition_dir)
+        renditions.append({
+            "height": rendition_height,
+            "width": even(width * rendition_height / height),
+            "bandwidth": peak,
+            "average_bandwidth": average,
+            "codecs": codecs_string(level),
+            "playlist": f"{rendition_dir}/index.m3u8".replace(os.sep, "/"),
+        })
+
+    if not up_to_date:
+        # Master playlist lists renditions best first. BANDWIDTH is the
+        # measured peak segment rate, as the HLS spec requires
+        lines = ["#EXTM3U", "#EXT-X-VERSION:3"]
+        for rendition in renditions:
+            lines.append(
+                f"#EXT-X-STREAM-INF:BANDWIDTH={rendition['bandwidth']},"
+                f"AVERAGE-BANDWIDTH={rendition['average_bandwidth']},"
+                f"CODECS=\"{rendition['codecs']}\","
+                f"RESOLUTION={rendition['width']}x{rendition['height']}"
+            )
+            lines.append(f"{rendition['height']}p/index.m3u8")
+        with open(master_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+        build_poster(source, poster_path, height)
+
+    return {
+        "version": version,
+        "hls": master_path.replace(os.sep, "/"),
+        "poster": poster_path.replace(os.sep, "/"),
+        "width": width,
+        "height": height,
+        "renditions": renditions,
+    }
+
+VIDEO_ELEMENT = re.compile(r"(<video\b[^>]*>)(.*?)(</video>)", re.DOTALL)
+MP4_SOURCE = re.compile(r'([ \t]*)<source src="([^"]+\.mp4)" type="video/mp4">')
+HLS_SOURCE = re.compile(r'[ \t]*<source [^>]*type="application/vnd\.apple\.mpegurl">\n?')
+MANAGED_ATTRIBUTES = re.compile(r'\s(?:poster|data-media)="[^"]*"')
+
+def update_video_element(match, manifest):
+    """Point one <video> element at the poster and HLS rendition of its MP4"""
+    open_tag, body, close_tag = match.groups()
+    mp4 = MP4_SOURCE.search(body)
+    entry = mp4 and manifest.get(mp4.group(2))
+    if not entry:
+        return match.group(0)
+
+    # Drop what a previous run added, then add the current version
+    open_tag = MANAGED_ATTRIBUTES.sub("", open_tag)
+    open_tag = f'{open_tag[:-1]} poster="{entry["poster"]}" data-media="{mp4.group(2)}">'
+    body = HLS_SOURCE.sub("", body)
+    mp4 = MP4_SOURCE.search(body)
+    indent = mp4.group(1)
+    hls_source = f'{indent}<source src="{entry["hls"]}" type="application/vnd.apple.mpegurl">\n'
+    body = body[:mp4.start()] + hls_source + body[mp4.start():]
+    return open_tag + body + close_tag
+
+def update_pages(manifest):
+    """
+    Rewrite the site pages so every managed video lists its sources directly.
+
+    The browser then chooses HLS or the MP4 fallback itself while parsing the
+    page, and shows the poster before any video data arrives. Re-running is
+    safe: previously added posters and HLS sources are replaced.
+    """
+    for page in sorted(os.listdir(".")):
+        if not page.endswith(".html"):
+            continue
+        with open(page, "r", encoding="utf-8") as f:
+            html = f.read()
+        updated = VIDEO_ELEMENT.sub(lambda m: update_video_element(m, manifest), html)
+        if updated != html:
+            with open(page, "w", encoding="utf-8") as f:
+                f.write(updated)
+            print(f"📝 Updated videos in {page}")
+
+def entry_version(entry):
+    """Version directory name of a manifest entry (older manifests lack the key)"""
+    return entry.get("version") or os.path.basename(os.path.dirname(entry["hls"]))
+
+def main():
+    parser = argparse.ArgumentParser(description="Build HLS renditions and posters for videos/")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if outputs exist")
+    args = parser.parse_args()
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    if not shutil.which("ffmpeg") or not shutil.which("ffprobe"):
+        print("❌ ffmpeg and ffprobe are required")
+        print("💡 Install ffmpeg and make sure it is on your PATH")
+        sys.exit(1)
+
+    previous = {}
+    if os.path.exists(MANIFEST_FILE):
+        with open(MANIFEST_FILE, "r") as f:
+            previous = json.load(f)
+
+    manifest = {}
+    for filename in sorted(os.listdir(VIDEOS_DIR)):
+        if not filename.lower().endswith(".mp4"):
+            continue
+        key = f"{VIDEOS_DIR}/{filename}"
+        try:
+            manifest[key] = build_video(filename, force=args.force)
+        except Exception as e:
+            print(f"❌ {filename}: {e}")
+            if key in previous:
+                # Keep serving the last good build
+                manifest[key] = previous[key]
+
+    with open(MANIFEST_FILE, "w") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"📄 Wrote {MANIFEST_FILE} ({len(manifest)} videos)")
+
+    update_pages(manifest)
+
+    # Old builds are pruned only once the pages point at the new versions.
+    # The previous version is kept as well, for clients with cached HTML.
+    for key, entry in manifest.items():
+        keep = {entry_version(entry)}
+        if key in previous:
+            keep.add(entry_version(previous[key]))
+        remove_old_builds(os.path.splitext(os.path.basename(key))[0], keep)
+
+if __name__ == "__main__":
+    main()
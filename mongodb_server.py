@@ -19,14 +19,15 @@ website with the following capabilities:
  
 
 Dependencies:
-- pymongo (MongoDB driver) - Optional, falls back to file storage
-- bcrypt (Password hashing)
+- pymongo (MongoDB driver) - Optional, falls back to file storage (imported lazily)
+- bcrypt (Password hashing, imported on first signup/login)
 - Standard library modules (json, os, datetime, http.server, etc.)
 
 Usage:
 1. Install MongoDB (optional): pip install pymongo
 2. Run server: python mongodb_server3.py
 3. Server starts on http://localhost:8000
+4. Options: --storage {auto,mongodb,file}, --profile-startup, --profile-queries
 
 API Endpoints:
 - POST /api/auth/register - User registration
@@ -53,30 +54,815 @@ Features:
 # =============================
 
 # Standard Library Imports
+import time                   
+_MODULE_LOAD_START = time.perf_counter()
+
+import argparse
+import gzip
+import importlib.util
 import json                    
 import os                     
+import re
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime  
-from http.server import HTTPServer, BaseHTTPRequestHandler  
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler  
 from urllib.parse import urlparse, parse_qs  # URL parsing
 import hashlib                # Hash functions (backup for passwords)
-import bcrypt                  # Secure password hashing
+import heapq
+import math
 import threading              
-import time                   
+from array import array
 
 # =====================================
-# MONGODB IMPORT WITH FALLBACK
+# STARTUP PROFILING
 # =====================================
 
-# Try to import pymongo for MongoDB support
-# If not available, fall back to file-based storage
-try:
-    import pymongo             
-    from pymongo import MongoClient  
-    MONGODB_AVAILABLE = True   
-except ImportError:
-    MONGODB_AVAILABLE = False  # MongoDB not available
-    print("⚠️  pymongo not installed. Using file storage instead.")
-    print("   Install with: pip install pymongo")
+class StartupProfiler:
+    """Collects import and initialization timings for --profile-startup"""
+
+    def __init__(self):
+        self.enabled = False
+        self.timings = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def measure(self, label):
+        """Time the wrapped block and record it under label"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(label, (time.perf_counter() - start) * 1000)
+
+    def add(self, label, elapsed_ms):
+        with self._lock:
+            self.timings.append((label, elapsed_ms))
+        if self.enabled:
+            print(f"⏱️  {label}: {elapsed_ms:.1f} ms")
+
+    def report(self):
+        """Print all timings collected so far"""
+        if not self.enabled:
+            return
+        print("⏱️  Startup profile:")
+        with self._lock:
+            for label, elapsed_ms in self.timings:
+                print(f"   {label:<32} {elapsed_ms:8.1f} ms")
+
+STARTUP_PROFILER = StartupProfiler()
+
+# =====================================
+# LAZY DEPENDENCY IMPORTS
+# =====================================
+
+# pymongo and bcrypt are comparatively slow to import, so they are only
+# loaded on first use. Availability is checked without importing.
+MONGODB_AVAILABLE = importlib.util.find_spec('pymongo') is not None
+
+_bcrypt = None
+
+def get_bcrypt():
+    """Import bcrypt on first use (password hashing only)"""
+    global _bcrypt
+
+    if _bcrypt is None:
+        with STARTUP_PROFILER.measure('import bcrypt'):
+            import bcrypt
+        _bcrypt = bcrypt
+    return _bcrypt
+
+def get_object_id(value):
+    """Convert a hex string to a bson ObjectId"""
+    from bson import ObjectId
+    return ObjectId(value)
+
+# =====================================
+# STORAGE SELECTION
+# =====================================
+
+# 'auto' tries MongoDB and falls back to files, 'mongodb' and 'file' force a mode
+STORAGE_MODE = 'auto'
+MONGODB_URI = 'mongodb://localhost:27017/'
+
+# File storage locations (fallback mode)
+USERS_FILE = 'users.json'
+PRODUCTS_FILE = 'products.json'
+
+# Requests run on separate threads; every file storage read and write, and
+# every read-modify-write sequence, holds this lock
+FILE_STORAGE_LOCK = threading.RLock()
+
+def read_json_file(path, default):
+    """Load a JSON storage file, returning default if it does not exist"""
+    with FILE_STORAGE_LOCK:
+        if not os.path.exists(path):
+            return default
+        with open(path, 'r') as f:
+            return json.load(f)
+
+def write_json_file(path, data):
+    """Write a JSON storage file atomically (temp file + os.replace)"""
+    with FILE_STORAGE_LOCK:
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(data, f, indent=2, default=str)
+        os.replace(temp_path, path)
+
+_database_lock = threading.Lock()
+_database = None
+_database_resolved = False
+
+def get_database():
+    """
+    Return the shared MongoDB database, or None when using file storage.
+
+    The connection is made once per process; every request handler reuses
+    it instead of opening a new client. A failed connection is remembered
+    too, so requests are not delayed by repeated server selection timeouts.
+    """
+    global _database, _database_resolved
+
+    if _database_resolved:
+        return _database
+
+    with _database_lock:
+        if _database_resolved:
+            return _database
+
+        if STORAGE_MODE == 'file':
+            print("📁 Using file storage")
+        elif not MONGODB_AVAILABLE:
+            if STORAGE_MODE == 'mongodb':
+                raise RuntimeError("pymongo is required for --storage mongodb")
+            print("⚠️  pymongo not installed. Using file storage instead.")
+            print("   Install with: pip install pymongo")
+        else:
+            try:
+                with STARTUP_PROFILER.measure('import pymongo'):
+                    from pymongo import MongoClient
+                with STARTUP_PROFILER.measure('connect to MongoDB'):
+                    client = MongoClient(MONGODB_URI, serverSelectionTimeoutMS=5000)
+                    client.server_info()
+                _database = client['elanicia_db']
+                print("✅ Connected to MongoDB")
+                with STARTUP_PROFILER.measure('ensure indexes'):
+                    ensure_indexes(_database)
+            except Exception as e:
+                if STORAGE_MODE == 'mongodb':
+                    raise
+                # MongoDB connection failed, fall back to file storage
+                print(f"❌ MongoDB connection failed: {e}")
+                print("📁 Falling back to file storage")
+                _database = None
+
+        _database_resolved = True
+        return _database
+
+def storage_ready():
+    """True once get_database() has decided between MongoDB and file storage"""
+    return _database_resolved
+
+# =====================================
+# DATABASE INDEXES
+# =====================================
+
+# Declarative index definitions, applied idempotently at startup.
+# Each entry: (collection name, list of (field, direction) keys, index options)
+INDEX_DEFINITIONS = [
+    ('users', [('email', 1)], {'name': 'users_email_unique', 'unique': True}),
+    ('products', [('id', 1)], {'name': 'products_id_unique', 'unique': True}),
+    # Covers the order history listing: filter on user_id, keyset on
+    # (created_at, _id) and project only indexed header fields
+    ('orders', [('user_id', 1), ('created_at', -1), ('_id', -1),
+                ('status', 1), ('total_amount', 1), ('currency', 1)],
+     {'name': 'orders_user_history'}),
+]
+
+# Order currencies are ISO 4217 codes; also used as a field name in order summaries
+CURRENCY_PATTERN = re.compile(r'^[A-Z]{3}$')
+
+# Fields returned by GET /api/orders; all of them live in orders_user_history
+# so the listing is answered from the index without fetching documents
+ORDER_HISTORY_PROJECTION = {
+    '_id': 1, 'created_at': 1, 'status': 1, 'total_amount': 1, 'currency': 1
+}
+
+_indexes_lock = threading.Lock()
+_indexes_ensured = False
+
+def ensure_indexes(db):
+    """
+    Create all indexes from INDEX_DEFINITIONS if they do not already exist.
+
+    create_index is a no-op when an identical index is already present, and a
+    module-level flag makes sure the work happens once per process even though
+    a handler is constructed for every request.
+
+    Args:
+        db: pymongo Database instance
+    """
+    global _indexes_ensured
+
+    with _indexes_lock:
+        if _indexes_ensured:
+            return
+
+        for collection_name, keys, options in INDEX_DEFINITIONS:
+            try:
+                db[collection_name].create_index(keys, **options)
+                print(f"🗂️  Index ready: {collection_name}.{options['name']}")
+            except Exception as e:
+                # e.g. duplicate keys already stored under a unique index
+                print(f"⚠️  Could not create index {collection_name}.{options['name']}: {e}")
+
+        _indexes_ensured = True
+
+# =====================================
+# SLOW QUERY PROFILER
+# =====================================
+
+class QueryProfiler:
+    """
+    Optional profiler that runs explain() once per distinct query shape.
+
+    A query shape is the collection name plus the sorted filter field names,
+    so {'email': 'a@b.c'} and {'email': 'x@y.z'} share a single explain().
+    Any plan that contains a COLLSCAN stage, and any query slower than the
+    threshold, is logged.
+    """
+
+    def __init__(self, enabled=False, slow_ms=100):
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        self._seen_shapes = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def query_shape(collection, query, sort=None):
+        """Build a hashable shape key for a query (values are ignored)"""
+        sort_keys = tuple(sort) if sort else ()
+        return (collection.name, tuple(sorted(query.keys())), sort_keys)
+
+    @staticmethod
+    def plan_stages(plan):
+        """Yield every stage name in a (possibly nested) winning plan"""
+        if not isinstance(plan, dict):
+            return
+        if 'stage' in plan:
+            yield plan['stage']
+        for key in ('inputStage', 'queryPlan'):
+            if key in plan:
+                yield from QueryProfiler.plan_stages(plan[key])
+        for child in plan.get('inputStages', []):
+            yield from QueryProfiler.plan_stages(child)
+
+    def record(self, collection, query, elapsed_ms, sort=None):
+        """
+        Record an executed query.
+
+        Args:
+            collection: pymongo Collection the query ran against
+            query: Filter document that was used
+            elapsed_ms: Wall-clock duration of the query in milliseconds
+            sort: Optional list of (field, direction) sort keys
+        """
+        if not self.enabled:
+            return
+
+        shape = self.query_shape(collection, query, sort)
+
+        if elapsed_ms > self.slow_ms:
+            print(f"🐢 SLOW QUERY ({elapsed_ms:.1f} ms): {shape[0]} {list(shape[1])}")
+
+        with self._lock:
+            if shape in self._seen_shapes:
+                return
+            self._seen_shapes.add(shape)
+
+        try:
+            cursor = collection.find(query)
+            if sort:
+                cursor = cursor.sort(sort)
+            plan = cursor.explain().get('queryPlanner', {}).get('winningPlan', {})
+            if 'COLLSCAN' in set(self.plan_stages(plan)):
+                print(f"🔍 COLLSCAN detected: {shape[0]} {list(shape[1])} - add an index")
+        except Exception as e:
+            print(f"⚠️  explain() failed for {shape[0]}: {e}")
+
+# Shared profiler instance, enabled from the command line (--profile-queries)
+QUERY_PROFILER = QueryProfiler()
+
+def profiled(collection, query, operation, sort=None):
+    """
+    Run a database operation and report it to the query profiler.
+
+    Args:
+        collection: pymongo Collection the operation runs against
+        query: Filter document used by the operation (explained on first sight)
+        operation: Callable performing the operation and returning its result
+        sort: Optional list of (field, direction) sort keys
+    """
+    start = time.perf_counter()
+    result = operation()
+    QUERY_PROFILER.record(collection, query, (time.perf_counter() - start) * 1000, sort)
+    return result
+
+def profiled_find(collection, query, projection=None):
+    """Run find() to completion under the query profiler and return a list"""
+    return profiled(collection, query, lambda: list(collection.find(query, projection)))
+
+# =====================================
+# SAMPLE DATA
+# =====================================
+
+def init_sample_data(db):
+    """Initialize sample product data (once, at startup)"""
+    products_collection = db['products']
+
+    # Check if products already exist
+    if profiled(products_collection, {}, lambda: products_collection.count_documents({})) > 0:
+        return
+
+    # Sample products data
+    sample_products = [
+        {
+            "id": "royal_timepieces_1",
+            "name": "Diamond Elite Necklace",
+            "category": "royal_timepieces",
+            "type": "jewelry",
+            "price": 125999,
+            "currency": "AED",
+            "description": "18k white gold, premium diamonds, luxury design",
+            "image": "images/diamond-necklace.jpg",
+            "badge": "Premium",
+            "in_stock": True,
+            "created_at": datetime.now()
+        },
+        {
+            "id": "royal_timepieces_2",
+            "name": "Platinum Heritage",
+            "category": "royal_timepieces",
+            "type": "watch",
+            "price": 195999,
+            "currency": "AED",
+            "description": "Platinum case, sapphire crystal, limited to 100 pieces",
+            "image": "images/platinum-watch.jpg",
+            "badge": "Limited Edition",
+            "in_stock": True,
+            "created_at": datetime.now()
+        },
+        {
+            "id": "best_sellers_1",
+            "name": "Classic Steel Master",
+            "category": "best_sellers",
+            "type": "watch",
+            "price": 35999,
+            "currency": "AED",
+            "description": "Stainless steel case, automatic movement, water resistant",
+            "image": "images/classic-steel-watch.jpg",
+            "badge": "Best Seller",
+            "in_stock": True,
+            "created_at": datetime.now()
+        }
+    ]
+
+    products_collection.insert_many(sample_products)
+    print("📦 Sample products added to database")
+
+
+# =====================================
+# CATALOG SNAPSHOT
+# =====================================
+
+def load_catalog(db):
+    """Load every product from MongoDB (db given) or the products file"""
+    if db is not None:
+        products = profiled_find(db['products'], {})
+        # Convert ObjectId to string
+        for product in products:
+            product['_id'] = str(product['_id'])
+        return products
+    return read_json_file(PRODUCTS_FILE, [])
+
+class CatalogSnapshot:
+    """
+    In-memory copy of the product catalog.
+
+    Preloaded in the background once the server socket is bound, then
+    reloaded on demand once it is older than max_age seconds.
+    """
+
+    def __init__(self, max_age=60):
+        self.max_age = max_age
+        self._products = None
+        self._by_id = {}
+        self._loaded_at = 0
+        self._lock = threading.Lock()
+
+    def refresh(self, products):
+        """Replace the snapshot contents"""
+        by_id = {p.get('id'): p for p in products}
+        with self._lock:
+            self._products = products
+            self._by_id = by_id
+            self._loaded_at = time.monotonic()
+
+    def is_fresh(self):
+        return self._products is not None and time.monotonic() - self._loaded_at < self.max_age
+
+    def products(self):
+        """Return all products, or None if the snapshot is missing or stale"""
+        with self._lock:
+            return self._products if self.is_fresh() else None
+
+    def get(self, product_id):
+        """Return one product, or None if unknown or the snapshot is stale"""
+        with self._lock:
+            return self._by_id.get(product_id) if self.is_fresh() else None
+
+CATALOG_SNAPSHOT = CatalogSnapshot()
+
+def current_catalog(db):
+    """Return the catalog snapshot, reloading it first if it is missing or stale"""
+    products = CATALOG_SNAPSHOT.products()
+    if products is None:
+        products = load_catalog(db)
+        CATALOG_SNAPSHOT.refresh(products)
+    return products
+
+def warm_up():
+    """
+    Background startup work, run after the socket is bound.
+
+    Resolves storage (connecting to MongoDB and applying indexes if needed),
+    seeds sample data and preloads the catalog snapshot so the first
+    requests do not pay for it.
+    """
+    db = None
+    try:
+        db = get_database()
+        if db is not None:
+            with STARTUP_PROFILER.measure('seed sample data'):
+                init_sample_data(db)
+        with STARTUP_PROFILER.measure('preload catalog snapshot'):
+            CATALOG_SNAPSHOT.refresh(load_catalog(db))
+        with STARTUP_PROFILER.measure('build related products'):
+            rebuild_related_products(db)
+    except Exception as e:
+        print(f"⚠️  Startup warm-up failed: {e}")
+    
+    # Started regardless of the outcome above: it retries a failed first build
+    threading.Thread(target=refresh_related_products_forever, args=(db,),
+                     name='related-refresh', daemon=True).start()
+    STARTUP_PROFILER.report()
+
+# =====================================
+# RELATED PRODUCTS
+# =====================================
+
+def order_item_ids(items):
+    """Extract distinct product ids from an order's items (dicts with 'id' or bare ids)"""
+    ids = set()
+    if not isinstance(items, list):
+        return ids
+    for item in items:
+        product_id = item.get('id') if isinstance(item, dict) else item
+        if product_id is not None:
+            ids.add(str(product_id))
+    return ids
+
+class RelatedProductsIndex:
+    """
+    Precomputed top-K "related products" table.
+
+    Co-purchase counts are kept as a sparse dict of product id pairs and
+    updated incrementally as orders arrive. recompute() combines them
+    (cosine-normalized) with same-category / same-type similarity from the
+    catalog and stores the top-K neighbours of every product in flat arrays
+    (CSR layout: offsets, neighbour indices, scores), so a lookup is a
+    dict access plus an array slice.
+    """
+
+    def __init__(self, top_k=8, category_weight=0.5, type_weight=0.25):
+        self.top_k = top_k
+        self.category_weight = category_weight
+        self.type_weight = type_weight
+        self._lock = threading.Lock()
+        self._pair_counts = {}     # (id_a, id_b) with id_a < id_b -> orders containing both
+        self._order_counts = {}    # id -> orders containing it
+        self._dirty = False
+        self._built = False
+        # Published table, replaced atomically by recompute()
+        self._products = []
+        self._index = {}
+        self._offsets = array('I', [0])
+        self._neighbors = array('I')
+        self._scores = array('f')
+
+    def add_order(self, items):
+        """Fold one order's items into the co-purchase counts"""
+        ids = sorted(order_item_ids(items))
+        if not ids:
+            return
+        with self._lock:
+            for i, id_a in enumerate(ids):
+                self._order_counts[id_a] = self._order_counts.get(id_a, 0) + 1
+                for id_b in ids[i + 1:]:
+                    self._pair_counts[(id_a, id_b)] = self._pair_counts.get((id_a, id_b), 0) + 1
+            self._dirty = True
+
+    def load_orders(self, orders):
+        """Replace the co-purchase counts with counts from an iterable of orders"""
+        fresh = RelatedProductsIndex()
+        for order in orders:
+            fresh.add_order(order.get('items'))
+        with self._lock:
+            self._pair_counts = fresh._pair_counts
+            self._order_counts = fresh._order_counts
+            self._dirty = True
+
+    @property
+    def dirty(self):
+        return self._dirty
+
+    @property
+    def built(self):
+        """True once recompute() has published a table"""
+        return self._built
+
+    def recompute(self, products):
+        """
+        Rebuild the top-K table for the given catalog.
+
+        Args:
+            products: List of product documents (with id, category and type)
+        """
+        with self._lock:
+            pair_counts = dict(self._pair_counts)
+            order_counts = dict(self._order_counts)
+            self._dirty = False
+
+        index = {str(p.get('id')): i for i, p in enumerate(products)}
+        by_category = {}
+        by_type = {}
+        for i, product in enumerate(products):
+            by_category.setdefault(product.get('category'), []).append(i)
+            by_type.setdefault(product.get('type'), []).append(i)
+
+        # Sparse co-purchase adjacency restricted to catalog products
+        co_purchase = {}
+        for (id_a, id_b), count in pair_counts.items():
+            if id_a in index and id_b in index:
+                score = count / math.sqrt(order_counts[id_a] * order_counts[id_b])
+                a, b = index[id_a], index[id_b]
+                co_purchase.setdefault(a, {})[b] = score
+                co_purchase.setdefault(b, {})[a] = score
+
+        offsets = array('I', [0])
+        neighbors = array('I')
+        scores = array('f')
+        for i, product in enumerate(products):
+            candidates = dict(co_purchase.get(i, {}))
+            if product.get('category') is not None:
+                for j in by_category[product.get('category')]:
+                    candidates[j] = candidates.get(j, 0) + self.category_weight
+            if product.get('type') is not None:
+                for j in by_type[product.get('type')]:
+                    candidates[j] = candidates.get(j, 0) + self.type_weight
+            candidates.pop(i, None)
+
+            for j, score in heapq.nlargest(self.top_k, candidates.items(), key=lambda c: c[1]):
+                neighbors.append(j)
+                scores.append(score)
+            offsets.append(len(neighbors))
+
+        with self._lock:
+            self._products = products
+            self._index = index
+            self._offsets = offsets
+            self._neighbors = neighbors
+            self._scores = scores
+            self._built = True
+
+    def related(self, product_id, limit=None):
+        """
+        Return [(product, score), ...] for a product, best first.
+
+        Returns None if the product is not in the table.
+        """
+        with self._lock:
+            i = self._index.get(product_id)
+            if i is None:
+                return None
+            start, end = self._offsets[i], self._offsets[i + 1]
+            if limit is not None:
+                end = min(end, start + limit)
+            return [(self._products[self._neighbors[n]], round(self._scores[n], 4))
+                    for n in range(start, end)]
+
+RELATED_PRODUCTS = RelatedProductsIndex()
+
+# Seconds between dirty checks, and between full rebuilds from the orders collection
+RELATED_REFRESH_INTERVAL = 30
+RELATED_REBUILD_INTERVAL = 600
+
+def rebuild_related_products(db):
+    """Full (offline) rebuild: recount co-purchases from all orders and recompute"""
+    if db is not None:
+        RELATED_PRODUCTS.load_orders(profiled_find(db['orders'], {}, {'items': 1, '_id': 0}))
+    RELATED_PRODUCTS.recompute(current_catalog(db))
+
+def refresh_related_products_forever(db):
+    """
+    Background refresh loop.
+
+    Recomputes the table when new orders have been added incrementally, and
+    does a full rebuild every RELATED_REBUILD_INTERVAL seconds (or on the
+    next tick if no build has succeeded yet) to pick up catalog changes and
+    orders written by other processes.
+    """
+    last_rebuild = time.monotonic()
+    while True:
+        time.sleep(RELATED_REFRESH_INTERVAL)
+        try:
+            if not RELATED_PRODUCTS.built or time.monotonic() - last_rebuild >= RELATED_REBUILD_INTERVAL:
+                rebuild_related_products(db)
+                last_rebuild = time.monotonic()
+            elif RELATED_PRODUCTS.dirty:
+                RELATED_PRODUCTS.recompute(current_catalog(db))
+        except Exception as e:
+            print(f"⚠️  Related products refresh failed: {e}")
+
+# =====================================
+# RESPONSE CACHE
+# =====================================
+
+# GET /api/products/<id>/related (shared by the router and the cache)
+RELATED_ROUTE = re.compile(r'^/api/products/([^/]+)/related$')
+
+# Anonymous GET routes that may be served from the response cache: (path pattern, TTL seconds)
+CACHEABLE_ROUTES = [
+    (re.compile(r'^/api/products$'), 30),
+    (re.compile(r'^/api/products/[^/]+$'), 30),
+    (RELATED_ROUTE, 60),
+    (re.compile(r'^/api/health$'), 2),
+]
+
+def cache_ttl_for(path):
+    """Return the cache TTL for a path, or None if it is not cacheable"""
+    for pattern, ttl in CACHEABLE_ROUTES:
+        if pattern.match(path):
+            return ttl
+    return None
+
+def accepts_gzip(accept_encoding):
+    """
+    True if an Accept-Encoding header allows gzip.
+    
+    Honours q-values: 'gzip;q=0' refuses gzip, and '*' only applies when gzip
+    is not listed explicitly. Malformed q-values count as refusal.
+    """
+    qualities = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.lower().startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[coding] = quality
+    
+    if 'gzip' in qualities:
+        return qualities['gzip'] > 0
+    return qualities.get('*', 0) > 0
+
+class CacheEntry:
+    """A cached response body and its freshness window"""
+
+    __slots__ = ('status', 'body', 'expires_at', 'stale_until', 'size')
+
+    def __init__(self, status, body, ttl, stale_ttl, key_size):
+        now = time.monotonic()
+        self.status = status
+        self.body = body
+        self.expires_at = now + ttl
+        self.stale_until = self.expires_at + stale_ttl
+        self.size = len(body) + key_size
+
+class _Flight:
+    """One in-progress computation that concurrent requests wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+class ResponseCache:
+    """
+    TTL + LRU response cache with a byte budget.
+
+    - Fresh entries are served directly.
+    - Expired entries are still served for stale_ttl seconds while a single
+      background refresh runs (stale-while-revalidate).
+    - On a miss only one request per key computes the response; concurrent
+      requests for the same key wait for its result (single-flight).
+    - Least recently used entries are evicted once max_bytes is exceeded.
+
+    Only 200 responses are stored.
+    """
+
+    def __init__(self, max_bytes=16 * 1024 * 1024, stale_ttl=60, wait_timeout=10):
+        self.max_bytes = max_bytes
+        self.stale_ttl = stale_ttl
+        self.wait_timeout = wait_timeout
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key_size(key):
+        return sum(len(part) for part in key)
+
+    def get(self, key, ttl, compute):
+        """
+        Return (status, body, cache_state) for key, computing it if needed.
+
+        Args:
+            key: Tuple of strings identifying the response
+            ttl: Freshness lifetime in seconds for a newly computed entry
+            compute: Callable returning (status, body bytes)
+
+        cache_state is one of HIT, STALE, MISS or COALESCED.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            now = time.monotonic()
+            if entry and now < entry.stale_until:
+                self._entries.move_to_end(key)
+                if now < entry.expires_at:
+                    return entry.status, entry.body, 'HIT'
+                if key not in self._inflight:
+                    flight = self._inflight[key] = _Flight()
+                    threading.Thread(target=self._run_flight, args=(key, ttl, compute, flight),
+                                     name='cache-revalidate', daemon=True).start()
+                return entry.status, entry.body, 'STALE'
+
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+
+        if leader:
+            status, body = self._run_flight(key, ttl, compute, flight)
+            return status, body, 'MISS'
+
+        if flight.done.wait(self.wait_timeout) and flight.result is not None:
+            status, body = flight.result
+            return status, body, 'COALESCED'
+
+        # The leader failed or took too long; compute independently
+        status, body = compute()
+        return status, body, 'MISS'
+
+    def _run_flight(self, key, ttl, compute, flight):
+        """Compute a response, store it if cacheable and release any waiters"""
+        try:
+            flight.result = compute()
+            status, body = flight.result
+            if status == 200:
+                self._store(key, CacheEntry(status, body, ttl, self.stale_ttl, self.key_size(key)))
+            return flight.result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+    def _store(self, key, entry):
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old:
+                self._size -= old.size
+            self._entries[key] = entry
+            self._size += entry.size
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted.size
+
+    def clear(self):
+        """Drop every cached response"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+RESPONSE_CACHE = ResponseCache()
 
 # ======================================
 # MAIN HTTP REQUEST HANDLER CLASS
@@ -112,103 +898,33 @@ class ElaniciaBackendHandler(BaseHTTPRequestHandler):
     
     def init_database(self):
         """
-        Initialize database connection based on availability.
+        Bind the shared database connection to this handler.
         
-        Tries to connect to MongoDB first. If MongoDB is not available or connection
-        fails, falls back to file-based storage system.
+        The connection itself is established once by get_database(); this only
+        looks up collections, so it is cheap enough to run for every request.
+        If MongoDB is not available, file-based storage is used instead.
         
         Database collections initialized:
         - users: User accounts and authentication data
         - products: Product catalog and inventory
         - orders: Order history and tracking
+        - order_summaries: Materialized per-user order totals
         """
-        if MONGODB_AVAILABLE:
-            try:
-                # Attempt MongoDB connection
-                self.client = MongoClient('mongodb://localhost:27017/', serverSelectionTimeoutMS=5000)
-                
-                # Test the connection
-                self.client.server_info()
-                
-                # Initialize database and collections
-                self.db = self.client['elanicia_db']
-                self.users_collection = self.db['users']
-                self.products_collection = self.db['products']
-                self.orders_collection = self.db['orders']
-                
-                # Set connection flag
-                self.mongo_connected = True
-                print("✅ Connected to MongoDB")
-                
-                # Initialize sample data for testing
-                self.init_sample_data()
-                
-            except Exception as e:
-                # MongoDB connection failed, fall back to file storage
-                print(f"❌ MongoDB connection failed: {e}")
-                print("📁 Falling back to file storage")
-                self.mongo_connected = False
-                self.users_file = 'users.json'
-                self.products_file = 'products.json'
+        # Never block a request on the connection attempt: until warm-up has
+        # resolved storage, data routes answer 503 (see storage_unavailable)
+        self.storage_ready = storage_ready()
+        db = _database if self.storage_ready else None
+        if db is not None:
+            self.db = db
+            self.users_collection = self.db['users']
+            self.products_collection = self.db['products']
+            self.orders_collection = self.db['orders']
+            self.order_summaries_collection = self.db['order_summaries']
+            self.mongo_connected = True
         else:
             self.mongo_connected = False
-            self.users_file = 'users.json'
-            self.products_file = 'products.json'
-    
-    def init_sample_data(self):
-        """Initialize sample product data"""
-        if not self.mongo_connected:
-            return
-            
-        # Check if products already exist
-        if self.products_collection.count_documents({}) > 0:
-            return
-        
-        # Sample products data
-        sample_products = [
-            {
-                "id": "royal_timepieces_1",
-                "name": "Diamond Elite Necklace",
-                "category": "royal_timepieces",
-                "type": "jewelry",
-                "price": 125999,
-                "currency": "AED",
-                "description": "18k white gold, premium diamonds, luxury design",
-                "image": "images/diamond-necklace.jpg",
-                "badge": "Premium",
-                "in_stock": True,
-                "created_at": datetime.now()
-            },
-            {
-                "id": "royal_timepieces_2",
-                "name": "Platinum Heritage",
-                "category": "royal_timepieces",
-                "type": "watch",
-                "price": 195999,
-                "currency": "AED",
-                "description": "Platinum case, sapphire crystal, limited to 100 pieces",
-                "image": "images/platinum-watch.jpg",
-                "badge": "Limited Edition",
-                "in_stock": True,
-                "created_at": datetime.now()
-            },
-            {
-                "id": "best_sellers_1",
-                "name": "Classic Steel Master",
-                "category": "best_sellers",
-                "type": "watch",
-                "price": 35999,
-                "currency": "AED",
-                "description": "Stainless steel case, automatic movement, water resistant",
-                "image": "images/classic-steel-watch.jpg",
-                "badge": "Best Seller",
-                "in_stock": True,
-                "created_at": datetime.now()
-            }
-        ]
-        
-        self.products_collection.insert_many(sample_products)
-        print("📦 Sample products added to database")
+            self.users_file = USERS_FILE
+            self.products_file = PRODUCTS_FILE
     
     def do_OPTIONS(self):
         """Handle CORS preflight requests"""
@@ -219,19 +935,38 @@ class ElaniciaBackendHandler(BaseHTTPRequestHandler):
         self.end_headers()
     
     def do_GET(self):
-        """Handle GET requests"""
+        """Handle GET requests, serving anonymous cacheable routes from the response cache"""
         parsed_path = urlparse(self.path)
+        
+        ttl = cache_ttl_for(parsed_path.path)
+        if ttl and self.is_anonymous():
+            self.serve_cached(parsed_path, ttl)
+        else:
+            self.route_get(parsed_path)
+    
+    def route_get(self, parsed_path):
+        """Dispatch a GET request to its handler method"""
         path = parsed_path.path
+        related_match = RELATED_ROUTE.match(path)
+        
+        if path != '/api/health' and self.storage_unavailable():
+            return
         
         if path == '/api/users':
             self.get_users()
         elif path == '/api/products':
             self.get_products()
+        elif related_match:
+            self.get_related_products(related_match.group(1), parse_qs(parsed_path.query))
         elif path.startswith('/api/products/'):
             product_id = path.split('/')[-1]
             self.get_product(product_id)
         elif path == '/api/health':
             self.health_check()
+        elif path == '/api/orders':
+            self.get_orders(parse_qs(parsed_path.query))
+        elif path == '/api/orders/summary':
+            self.get_order_summary(parse_qs(parsed_path.query))
         else:
             self.send_error(404, "Endpoint not found")
     
@@ -240,6 +975,9 @@ class ElaniciaBackendHandler(BaseHTTPRequestHandler):
         parsed_path = urlparse(self.path)
         path = parsed_path.path
         
+        if self.storage_unavailable():
+            return
+        
         if path == '/api/signup':
             self.handle_signup()
         elif path == '/api/login':
@@ -251,8 +989,29 @@ class ElaniciaBackendHandler(BaseHTTPRequestHandler):
         else:
             self.send_error(404, "Endpoint not found")
     
+    def storage_unavailable(self):
+        """Send 503 and return True if storage is still being resolved"""
+        if self.storage_ready:
+            return False
+        self.send_json_response(503, {'error': 'Server is starting, storage not ready yet'})
+        return True
+    
     def health_check(self):
-        """Health check endpoint"""
+        """
+        Health check endpoint (never waits for storage).
+        
+        Answers 503 until warm-up has resolved storage, matching the data
+        routes, so readiness probes only route traffic to a usable worker.
+        Non-200 responses are never stored by RESPONSE_CACHE.
+        """
+        if not self.storage_ready:
+            self.send_json_response(503, {
+                'status': 'starting',
+                'database': 'connecting',
+                'timestamp': datetime.now().isoformat()
+            })
+            return
+        
         status = {
             'status': 'healthy',
             'database': 'mongodb' if self.mongo_connected else 'file_storage',
@@ -264,7 +1023,7 @@ class ElaniciaBackendHandler(BaseHTTPRequestHandler):
         """Get all users (admin endpoint)"""
         try:
             if self.mongo_connected:
-                users = list(self.users_collection.find({}, {'password': 0}))
+                users = profiled_find(self.users_collection, {}, {'password': 0})
                 # Convert ObjectId to string
                 for user in users:
                     user['_id'] = str(user['_id'])
@@ -280,13 +1039,7 @@ class ElaniciaBackendHandler(BaseHTTPRequestHandler):
     def get_products(self):
         """Get all products"""
         try:
-            if self.mongo_connected:
-                products = list(self.products_collection.find({}))
-                # Convert ObjectId to string
-                for product in products:
-                    product['_id'] = str(product['_id'])
-            else:
-                products = self.load_products_from_file()
+            products = current_catalog(self.db if self.mongo_connected else None)
             
             self.send_json_response(200, {'products': products})
         except Exception as e:
@@ -295,8 +1048,11 @@ class ElaniciaBackendHandler(BaseHTTPRequestHandler):
     def get_product(self, product_id):
         """Get single product by ID"""
         try:
-            if self.mongo_connected:
-                product = self.products_collection.find_one({'id': product_id})
+            product = CATALOG_SNAPSHOT.get(product_id)
+            if product:
+                self.send_json_response(200, {'product': product})
+            elif self.mongo_connected:
+                product = self.find_one_profiled(self.products_collection, {'id': product_id})
                 if product:
                     product['_id'] = str(product['_id'])
                     self.send_json_response(200, {'product': product})
@@ -312,6 +1068,31 @@ class ElaniciaBackendHandler(BaseHTTPRequestHandler):
         except Exception as e:
             self.send_json_response(500, {'error': str(e)})
     
+    def get_related_products(self, product_id, query):
+        """Get related products from the precomputed in-memory table"""
+        try:
+            try:
+                limit = min(max(int(query.get('limit', ['8'])[0]), 1), RELATED_PRODUCTS.top_k)
+            except ValueError:
+                self.send_json_response(400, {'error': 'limit must be an integer'})
+                return
+            
+            if not RELATED_PRODUCTS.built:
+                self.send_json_response(503, {'error': 'Related products are still being computed'})
+                return
+            
+            related = RELATED_PRODUCTS.related(product_id, limit)
+            if related is None:
+                self.send_json_response(404, {'error': 'Product not found'})
+                return
+            
+            self.send_json_response(200, {
+                'product_id': product_id,
+                'related': [dict(product, score=score) for product, score in related]
+            })
+        except Exception as e:
+            self.send_json_response(500, {'error': str(e)})
+    
     def handle_signup(self):
         """Handle user registration"""
         try:
@@ -334,7 +1115,7 @@ class ElaniciaBackendHandler(BaseHTTPRequestHandler):
             
             # Check if user exists
             if self.mongo_connected:
-                existing_user = self.users_collection.find_one({'email': email})
+                existing_user = self.find_one_profiled(self.users_collection, {'email': email})
             else:
                 users = self.load_users_from_file()
                 existing_user = next((u for u in users if u['email'] == email), None)
@@ -344,6 +1125,7 @@ class ElaniciaBackendHandler(BaseHTTPRequestHandler):
                 return
             
             # Hash password
+            bcrypt = get_bcrypt()
             hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
             
             # Create new user
@@ -356,13 +1138,27 @@ class ElaniciaBackendHandler(BaseHTTPRequestHandler):
             }
             
             if self.mongo_connected:
-                result = self.users_collection.insert_one(new_user)
+                from pymongo.errors import DuplicateKeyError
+                try:
+                    result = self.users_collection.insert_one(new_user)
+                except DuplicateKeyError:
+                    # A concurrent signup won the race on users_email_unique
+                    self.send_json_response(400, {'error': 'User with this email already exists'})
+                    return
                 user_id = str(result.inserted_id)
             else:
-                users = self.load_users_from_file()
-                new_user['id'] = len(users) + 1
-                users.append(new_user)
-                self.save_users_to_file(users)
+                # Re-check and append under the lock so concurrent signups
+                # cannot both pass the check or get the same id
+                with FILE_STORAGE_LOCK:
+                    users = self.load_users_from_file()
+                    duplicate = any(u['email'] == email for u in users)
+                    if not duplicate:
+                        new_user['id'] = max((u.get('id', 0) for u in users), default=0) + 1
+                        users.append(new_user)
+                        self.save_users_to_file(users)
+                if duplicate:
+                    self.send_json_response(400, {'error': 'User with this email already exists'})
+                    return
                 user_id = new_user['id']
             
             self.send_json_response(201, {
@@ -395,12 +1191,12 @@ class ElaniciaBackendHandler(BaseHTTPRequestHandler):
             
             # Find user
             if self.mongo_connected:
-                user = self.users_collection.find_one({'email': email})
+                user = self.find_one_profiled(self.users_collection, {'email': email})
             else:
                 users = self.load_users_from_file()
                 user = next((u for u in users if u['email'] == email), None)
             
-            if user and bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
+            if user and get_bcrypt().checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
                 user_id = str(user.get('_id', user.get('id', '')))
                 self.send_json_response(200, {
                     'message': 'Login successful',
@@ -426,50 +1222,266 @@ class ElaniciaBackendHandler(BaseHTTPRequestHandler):
             post_data = self.rfile.read(content_length)
             data = json.loads(post_data.decode('utf-8'))
             
+            # Validation (before anything is stored)
+            total_amount = data.get('total_amount', 0)
+            currency = data.get('currency', 'AED')
+            
+            if isinstance(total_amount, bool) or not isinstance(total_amount, (int, float)) or total_amount < 0:
+                self.send_json_response(400, {'error': 'total_amount must be a non-negative number'})
+                return
+            
+            if not isinstance(currency, str) or not CURRENCY_PATTERN.match(currency):
+                self.send_json_response(400, {'error': 'currency must be a 3-letter ISO code'})
+                return
+            
+            items = data.get('items', [])
+            if not isinstance(items, list):
+                self.send_json_response(400, {'error': 'items must be a list'})
+                return
+            
             # Create order
             order = {
-                'user_id': data.get('user_id'),
-                'items': data.get('items', []),
-                'total_amount': data.get('total_amount', 0),
-                'currency': data.get('currency', 'AED'),
+                # Stored as a string so it matches ?user_id= lookups
+                'user_id': str(data['user_id']) if data.get('user_id') is not None else None,
+                'items': items,
+                'total_amount': total_amount,
+                'currency': currency,
                 'status': 'pending',
                 'created_at': datetime.now()
             }
             
             if self.mongo_connected:
                 result = self.orders_collection.insert_one(order)
+                try:
+                    self.update_order_summary(order)
+                except Exception as e:
+                    # The order is stored; --rebuild-order-summaries repairs the summary
+                    print(f"⚠️  Order summary update failed for user {order['user_id']}: {e}")
                 order['_id'] = str(result.inserted_id)
             
+            try:
+                RELATED_PRODUCTS.add_order(order['items'])
+            except Exception as e:
+                # Only affects recommendations; the next full rebuild picks the order up
+                print(f"⚠️  Related products update failed: {e}")
+            
             self.send_json_response(201, {
                 'message': 'Order created successfully',
                 'order': order
             })
             
+        except json.JSONDecodeError:
+            self.send_json_response(400, {'error': 'Invalid JSON data'})
+        except Exception as e:
+            self.send_json_response(500, {'error': str(e)})
+    
+    def get_orders(self, query):
+        """
+        Get a page of a user's order history, newest first.
+        
+        Uses keyset pagination on (created_at, _id): the response carries a
+        next_cursor that is passed back as ?cursor= to fetch the next page, so
+        every page costs the same regardless of how deep the history goes.
+        
+        Args:
+            query: Parsed query string (user_id, limit, cursor)
+        """
+        try:
+            user_id = query.get('user_id', [''])[0]
+            if not user_id:
+                self.send_json_response(400, {'error': 'user_id is required'})
+                return
+            
+            if not self.mongo_connected:
+                self.send_json_response(503, {'error': 'Order history requires MongoDB'})
+                return
+            
+            try:
+                limit = min(max(int(query.get('limit', ['20'])[0]), 1), 100)
+            except ValueError:
+                self.send_json_response(400, {'error': 'limit must be an integer'})
+                return
+            
+            filters = {'user_id': user_id}
+            cursor_token = query.get('cursor', [''])[0]
+            if cursor_token:
+                try:
+                    created_at, order_id = decode_order_cursor(cursor_token)
+                except ValueError:
+                    self.send_json_response(400, {'error': 'Invalid cursor'})
+                    return
+                filters['$or'] = [
+                    {'created_at': {'$lt': created_at}},
+                    {'created_at': created_at, '_id': {'$lt': order_id}}
+                ]
+            
+            sort = [('created_at', -1), ('_id', -1)]
+            orders = profiled(self.orders_collection, filters, lambda: list(
+                self.orders_collection.find(filters, ORDER_HISTORY_PROJECTION)
+                .sort(sort)
+                .hint('orders_user_history')
+                .limit(limit + 1)
+            ), sort)
+            
+            # One extra row tells us whether another page exists
+            next_cursor = None
+            if len(orders) > limit:
+                orders = orders[:limit]
+                last = orders[-1]
+                next_cursor = encode_order_cursor(last['created_at'], last['_id'])
+            
+            for order in orders:
+                order['_id'] = str(order['_id'])
+            
+            self.send_json_response(200, {'orders': orders, 'next_cursor': next_cursor})
         except Exception as e:
             self.send_json_response(500, {'error': str(e)})
     
+    def get_order_summary(self, query):
+        """Get the materialized order summary for a user (single key lookup)"""
+        try:
+            user_id = query.get('user_id', [''])[0]
+            if not user_id:
+                self.send_json_response(400, {'error': 'user_id is required'})
+                return
+            
+            if not self.mongo_connected:
+                self.send_json_response(503, {'error': 'Order history requires MongoDB'})
+                return
+            
+            summary = self.find_one_profiled(self.order_summaries_collection, {'_id': user_id})
+            if summary:
+                summary['user_id'] = summary.pop('_id')
+            else:
+                summary = {'user_id': user_id, 'order_count': 0, 'totals': {}, 'last_order': None}
+            
+            self.send_json_response(200, {'summary': summary})
+        except Exception as e:
+            self.send_json_response(500, {'error': str(e)})
+    
+    def update_order_summary(self, order):
+        """
+        Fold a newly inserted order into its user's materialized summary.
+        
+        An atomic upsert increments order_count and the per-currency lifetime
+        total; a second, conditional update replaces last_order only if this
+        order is at least as new, so concurrent inserts that finish out of
+        order cannot make the summary point at an older order.
+        
+        Args:
+            order: Order document as inserted (with its ObjectId _id)
+        """
+        if not order.get('user_id'):
+            return
+        
+        currency = order.get('currency', 'AED')
+        summaries = self.order_summaries_collection
+        query = {'_id': order['user_id']}
+        profiled(summaries, query, lambda: summaries.update_one(
+            query,
+            {
+                '$inc': {
+                    'order_count': 1,
+                    f'totals.{currency}': order.get('total_amount', 0)
+                }
+            },
+            upsert=True
+        ))
+        
+        newer_query = {
+            '_id': order['user_id'],
+            '$or': [
+                {'last_order': {'$exists': False}},
+                {'last_order.created_at': {'$lte': order['created_at']}}
+            ]
+        }
+        profiled(summaries, newer_query, lambda: summaries.update_one(
+            newer_query,
+            {
+                '$set': {
+                    'last_order': {
+                        'id': str(order['_id']),
+                        'created_at': order['created_at'],
+                        'total_amount': order.get('total_amount', 0),
+                        'currency': currency,
+                        'status': order.get('status')
+                    }
+                }
+            }
+        ))
+    
+    # Database query helpers
+    def find_one_profiled(self, collection, query, projection=None):
+        """Run find_one and report it to the query profiler"""
+        return profiled(collection, query, lambda: collection.find_one(query, projection))
+    
     # File storage methods (fallback)
     def load_users_from_file(self):
         """Load users from file"""
-        if os.path.exists(self.users_file):
-            with open(self.users_file, 'r') as f:
-                return json.load(f)
-        return []
+        return read_json_file(self.users_file, [])
     
     def save_users_to_file(self, users):
         """Save users to file"""
-        with open(self.users_file, 'w') as f:
-            json.dump(users, f, indent=2, default=str)
+        write_json_file(self.users_file, users)
     
     def load_products_from_file(self):
         """Load products from file"""
-        if os.path.exists(self.products_file):
-            with open(self.products_file, 'r') as f:
-                return json.load(f)
-        return []
+        return read_json_file(self.products_file, [])
+    
+    # Response cache helpers
+    def is_anonymous(self):
+        """True if the request carries no credentials"""
+        return not self.headers.get('Authorization') and not self.headers.get('Cookie')
+    
+    def serve_cached(self, parsed_path, ttl):
+        """Serve a GET route through RESPONSE_CACHE"""
+        encoding = 'gzip' if accepts_gzip(self.headers.get('Accept-Encoding', '')) else 'identity'
+        key = (parsed_path.path, parsed_path.query, encoding)
+        
+        def compute():
+            status, body = self.capture_response(parsed_path)
+            if encoding == 'gzip':
+                body = gzip.compress(body)
+            return status, body
+        
+        try:
+            status, body, cache_state = RESPONSE_CACHE.get(key, ttl, compute)
+        except Exception as e:
+            self.send_json_response(500, {'error': str(e)})
+            return
+        
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if encoding == 'gzip':
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('Cache-Control', f'public, max-age={ttl}')
+        self.send_header('X-Cache', cache_state)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, PUT, DELETE, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def capture_response(self, parsed_path):
+        """Run a GET handler and return its (status, body) instead of writing it"""
+        self._captured = None
+        self._capturing = True
+        try:
+            self.route_get(parsed_path)
+        finally:
+            self._capturing = False
+        if self._captured is None:
+            raise RuntimeError(f"No response produced for {parsed_path.path}")
+        return self._captured
     
     def send_json_response(self, status_code, data):
         """Send JSON response with CORS headers"""
+        if getattr(self, '_capturing', False):
+            self._captured = (status_code, json.dumps(data, indent=2, default=str).encode('utf-8'))
+            return
+        
         self.send_response(status_code)
         self.send_header('Content-Type', 'application/json')
         self.send_header('Access-Control-Allow-Origin', '*')
@@ -484,10 +1496,97 @@ class ElaniciaBackendHandler(BaseHTTPRequestHandler):
         """Custom log message"""
         print(f"🔗 BACKEND API: {format % args}")
 
+def encode_order_cursor(created_at, order_id):
+    """Build an opaque keyset cursor from the last order on a page"""
+    return f"{created_at.isoformat()}_{order_id}"
+
+def decode_order_cursor(token):
+    """
+    Parse a cursor produced by encode_order_cursor.
+    
+    Raises:
+        ValueError: If the token is malformed
+    """
+    created_at, _, order_id = token.rpartition('_')
+    try:
+        return datetime.fromisoformat(created_at), get_object_id(order_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {token}") from e
+
+def rebuild_order_summaries(db):
+    """
+    Recompute every order summary from scratch.
+    
+    Incremental updates in create_order keep summaries current; this is only
+    needed once to backfill orders placed before summaries existed.
+    """
+    pipeline = [
+        {'$match': {'user_id': {'$nin': [None, '']}}},
+        {'$sort': {'created_at': 1}},
+        {'$group': {
+            '_id': {'user_id': '$user_id', 'currency': '$currency'},
+            'order_count': {'$sum': 1},
+            'total': {'$sum': '$total_amount'},
+            'last_order': {'$last': {
+                'id': {'$toString': '$_id'},
+                'created_at': '$created_at',
+                'total_amount': '$total_amount',
+                'currency': '$currency',
+                'status': '$status'
+            }}
+        }}
+    ]
+    
+    summaries = {}
+    for row in db['orders'].aggregate(pipeline, allowDiskUse=True):
+        user_id = row['_id']['user_id']
+        summary = summaries.setdefault(user_id, {'_id': user_id, 'order_count': 0, 'totals': {}, 'last_order': None})
+        summary['order_count'] += row['order_count']
+        summary['totals'][row['_id']['currency']] = row['total']
+        if summary['last_order'] is None or row['last_order']['created_at'] > summary['last_order']['created_at']:
+            summary['last_order'] = row['last_order']
+    
+    db['order_summaries'].delete_many({})
+    if summaries:
+        db['order_summaries'].insert_many(list(summaries.values()))
+    print(f"📊 Rebuilt order summaries for {len(summaries)} users")
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description='Elanicia backend server')
+    parser.add_argument('--port', type=int, default=8001, help='Port to listen on')
+    parser.add_argument('--storage', choices=['auto', 'mongodb', 'file'], default='auto',
+                        help='Storage backend (default: auto, MongoDB with file fallback)')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='Report import and initialization timings')
+    parser.add_argument('--profile-queries', action='store_true',
+                        help='Run explain() per query shape and log COLLSCANs and slow queries')
+    parser.add_argument('--slow-query-ms', type=float, default=100,
+                        help='Slow query threshold in milliseconds (default: 100)')
+    parser.add_argument('--rebuild-order-summaries', action='store_true',
+                        help='Backfill order_summaries from the orders collection and exit')
+    return parser.parse_args(argv)
+
 def run_backend_server(port=8001):
     """Run the backend server"""
     server_address = ('', port)
-    httpd = HTTPServer(server_address, ElaniciaBackendHandler)
+    
+    # A forced storage mode is resolved before binding, so a misconfigured
+    # worker exits instead of serving errors
+    if STORAGE_MODE != 'auto':
+        try:
+            get_database()
+        except Exception as e:
+            print(f"❌ Storage '{STORAGE_MODE}' unavailable: {e}")
+            raise SystemExit(1)
+    
+    with STARTUP_PROFILER.measure('bind socket'):
+        httpd = ThreadingHTTPServer(server_address, ElaniciaBackendHandler)
+    
+    # Storage, sample data and catalog are prepared after the socket is bound,
+    # so the worker can accept connections immediately
+    threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
+    STARTUP_PROFILER.add('ready to accept connections', (time.perf_counter() - _MODULE_LOAD_START) * 1000)
     
     print(f"🚀 Elanicia Backend Server running on http://localhost:{port}")
     print(f"📊 API Endpoints:")
@@ -496,7 +1595,10 @@ def run_backend_server(port=8001):
     print(f"   GET  /api/users      - List users (admin)")
     print(f"   GET  /api/products   - List all products")
     print(f"   GET  /api/products/id - Get single product")
+    print(f"   GET  /api/products/id/related - Related products")
     print(f"   POST /api/orders     - Create order")
+    print(f"   GET  /api/orders?user_id= - Order history (paginated)")
+    print(f"   GET  /api/orders/summary?user_id= - Order summary")
     print(f"   GET  /api/health     - Health check")
     print(f"🔄 Press Ctrl+C to stop the server")
     
@@ -507,4 +1609,23 @@ def run_backend_server(port=8001):
         httpd.server_close()
 
 if __name__ == '__main__':
-    run_backend_server()
\ No newline at end of file
+    STARTUP_PROFILER.add('module import', (time.perf_counter() - _MODULE_LOAD_START) * 1000)
+    args = parse_args()
+    STARTUP_PROFILER.enabled = args.profile_startup
+    STORAGE_MODE = args.storage
+    QUERY_PROFILER.enabled = args.profile_queries
+    QUERY_PROFILER.slow_ms = args.slow_query_ms
+    if QUERY_PROFILER.enabled:
+        print(f"🔍 Query profiler enabled (slow threshold: {args.slow_query_ms} ms)")
+    if args.rebuild_order_summaries:
+        try:
+            db = get_database()
+        except Exception as e:
+            print(f"❌ MongoDB unavailable: {e}")
+            raise SystemExit(1)
+        if db is None:
+            print("❌ --rebuild-order-summaries requires MongoDB")
+            raise SystemExit(1)
+        rebuild_order_summaries(db)
+        raise SystemExit(0)
+    run_backend_server(args.port)
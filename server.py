@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Elanicia static web server
+
+Serves the website files on port 8000. Only site assets are exposed: the
+top-level *.html, *.css and *.js files plus images/ and videos/. Dotfiles,
+*.py and *.json (other than the media manifest) return 404, so file-storage
+data such as users.json and the .git directory are never served.
+
+Caching is suited to the media pipeline (see build_media.py):
+- videos/hls/ and videos/posters/ are versioned by content hash, so successful
+  responses are cached for a year and marked immutable
+- error responses are sent with no-store
+- videos/media_manifest.json is revalidated on every request
+- everything else uses the browser's default heuristics
+"""
+
+import argparse
+import os
+import posixpath
+from urllib.parse import unquote
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+# Path prefixes whose files never change under the same URL
+IMMUTABLE_PREFIXES = ("/videos/hls/", "/videos/posters/")
+NO_CACHE_PATHS = ("/videos/media_manifest.json",)
+
+# Allowlist of what may be served
+PUBLIC_PAGE_EXTENSIONS = (".html", ".css", ".js")
+PUBLIC_DIRECTORIES = ("images", "videos")
+PUBLIC_FILES = ("/videos/media_manifest.json",)
+PRIVATE_EXTENSIONS = (".py", ".pyc", ".json")
+
+def is_public(url_path):
+    """True if a request path refers to a servable site asset"""
+    path = posixpath.normpath(unquote(url_path.split("?", 1)[0].split("#", 1)[0]))
+    if path == "/":
+        return True  # index.html
+    if path in PUBLIC_FILES:
+        return True
+
+    parts = path.lstrip("/").split("/")
+    extension = os.path.splitext(parts[-1])[1].lower()
+    if any(part.startswith(".") for part in parts) or not extension:
+        return False  # dotfiles and directory listings
+    if extension in PRIVATE_EXTENSIONS:
+        return False
+    if len(parts) == 1:
+        return extension in PUBLIC_PAGE_EXTENSIONS
+    return parts[0] in PUBLIC_DIRECTORIES
+
+class ElaniciaStaticHandler(SimpleHTTPRequestHandler):
+    """Static file handler with HLS MIME types and long-lived media caching"""
+
+    extensions_map = {
+        **SimpleHTTPRequestHandler.extensions_map,
+        ".m3u8": "application/vnd.apple.mpegurl",
+        ".ts": "video/mp2t",
+        ".mp4": "video/mp4",
+    }
+
+    def send_head(self):
+        """Refuse anything outside the allowlist before touching the filesystem"""
+        if not is_public(self.path):
+            self.send_error(404, "File not found")
+            return None
+        return super().send_head()
+
+    # Statuses whose bodies may be cached as immutable media
+    CACHEABLE_STATUSES = (200, 206)
+
+    def send_response(self, code, message=None):
+        """Remember the status so end_headers can pick the caching policy"""
+        self._status = code
+        super().send_response(code, message)
+
+    def end_headers(self):
+        """Add Cache-Control before finishing the headers"""
+        path = self.path.split("?", 1)[0]
+        status = getattr(self, "_status", 200)
+        if status >= 400:
+            # Never let a missing segment or poster stick in a cache
+            self.send_header("Cache-Control", "no-store")
+        elif path.startswith(IMMUTABLE_PREFIXES) and status in self.CACHEABLE_STATUSES:
+            self.send_header("Cache-Control", "public, max-age=31536000, immutable")
+        elif path in NO_CACHE_PATHS:
+            self.send_header("Cache-Control", "no-cache")
+        super().end_headers()
+
+    def log_message(self, format, *args):
+        """Custom log message"""
+        print(f"🌐 WEB: {format % args}")
+
+def run_web_server(port=8000):
+    """Run the static web server from the website directory"""
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    httpd = ThreadingHTTPServer(("", port), ElaniciaStaticHandler)
+    print(f"🌐 Elanicia Web Server running on http://localhost:{port}")
+
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Web server stopped")
+        httpd.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Elanicia static web server")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on")
+    run_web_server(parser.parse_args().port)
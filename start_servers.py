@@ -3,6 +3,7 @@
 Start both the web server and MongoDB backend server for Elanicia
 """
 
+import importlib.util
 import subprocess
 import sys
 import time
@@ -26,34 +27,32 @@ def run_backend_server():
     except KeyboardInterrupt:
         print("🔗 Backend server stopped")
 
-def install_requirements():
-    """Install required Python packages"""
-    print("📦 Checking required packages...")
+# Optional packages and what stops working without them
+REQUIREMENTS = {
+    "pymongo": "MongoDB support (backend falls back to file storage)",
+    "bcrypt": "signup and login (password hashing)",
+}
+
+def check_requirements():
+    """Report which optional packages are missing and what breaks (without importing them)"""
+    print("📦 Checking optional packages...")
     
-    try:
-        import pymongo
-        import bcrypt
-        print("✅ All packages already installed")
+    missing = [name for name in REQUIREMENTS if importlib.util.find_spec(name) is None]
+    if not missing:
+        print("✅ All packages installed")
         return True
-    except ImportError:
-        print("📦 Installing required packages...")
-        try:
-            subprocess.run([sys.executable, "-m", "pip", "install", "pymongo", "bcrypt"], check=True)
-            print("✅ Packages installed successfully")
-            return True
-        except subprocess.CalledProcessError:
-            print("❌ Failed to install packages")
-            print("💡 Please install manually: pip install pymongo bcrypt")
-            return False
+    
+    for name in missing:
+        print(f"⚠️  {name} not installed - continuing without {REQUIREMENTS[name]}")
+    print(f"💡 Install with: pip install {' '.join(missing)}")
+    return False
 
 def main():
     print("🚀 Starting Elanicia Full-Stack Application")
     print("=" * 60)
     
-    # Install requirements
-    if not install_requirements():
-        print("⚠️  Continuing without MongoDB support...")
-        time.sleep(2)
+    # Check requirements (installing is left to the operator)
+    check_requirements()
     
     print("\n🔧 Starting servers...")
     print("📍 Web Server: http://localhost:8000")